@@ -1,4 +1,9 @@
+import hashlib
+import os
+import pickle
 import sys
+import tempfile
+from collections import deque
 from pathlib import Path
 
 EPSILON = "ε"
@@ -12,115 +17,118 @@ def normalize_symbol(token):
     return EPSILON if token in EPSILON_ALIASES else token
 
 
-def cal_first(s, productions, memo=None, visiting=None):
-    if memo is None:
-        memo = {}
-    if visiting is None:
-        visiting = set()
+def compute_all_first(productions):
+    first = {s: set() for s in productions}
 
-    if s in memo:
-        return memo[s]
+    # dependents[s] holds every head with a production mentioning s, i.e. the
+    # non-terminals whose FIRST set has to be revisited when first[s] grows.
+    dependents = {s: set() for s in productions}
+    for head, rules in productions.items():
+        for production in rules:
+            for symbol in production:
+                if symbol in productions:
+                    dependents[symbol].add(head)
 
-    if s not in productions:
-        return {normalize_symbol(s)}
+    worklist = deque(productions)
+    in_queue = set(productions)
 
-    if s in visiting:
-        return set()
+    while worklist:
+        s = worklist.popleft()
+        in_queue.discard(s)
 
-    visiting.add(s)
-    first = set()
+        target = first[s]
+        before = len(target)
 
-    for production in productions[s]:
-        if not production:
-            first.add(EPSILON)
-            continue
+        for production in productions[s]:
+            all_can_be_epsilon = True
 
-        all_can_be_epsilon = True
+            for symbol in production:
+                if symbol == EPSILON:
+                    continue
 
-        for symbol in production:
-            if symbol == EPSILON:
-                continue
+                if symbol in productions:
+                    sub_first = first[symbol]
+                    target.update(sub_first - {EPSILON})
+                    if EPSILON in sub_first:
+                        continue
+                else:
+                    target.add(symbol)
 
-            if symbol in productions:
-                sub_first = cal_first(symbol, productions, memo, visiting)
-                first.update(sub_first - {EPSILON})
-                if EPSILON in sub_first:
-                    continue
-            else:
-                first.add(symbol)
                 all_can_be_epsilon = False
                 break
 
-            if symbol in productions and EPSILON not in sub_first:
-                all_can_be_epsilon = False
-                break
+            if all_can_be_epsilon:
+                target.add(EPSILON)
+
+        if len(target) == before:
+            continue
 
-        if all_can_be_epsilon:
-            first.add(EPSILON)
+        for dependent in dependents[s]:
+            if dependent not in in_queue:
+                in_queue.add(dependent)
+                worklist.append(dependent)
 
-    visiting.remove(s)
-    memo[s] = first
     return first
 
 
-def cal_follow(s, productions, first, memo=None, visiting=None, start_symbol=None):
-    if memo is None:
-        memo = {}
-    if visiting is None:
-        visiting = set()
-    if start_symbol is None:
-        start_symbol = next(iter(productions))
+def index_occurrences(productions):
+    occurrences = {}
+    for head, rules in productions.items():
+        for production in rules:
+            for idx, symbol in enumerate(production):
+                occurrences.setdefault(symbol, []).append((head, production, idx))
+    return occurrences
 
-    if s in memo:
-        return memo[s]
 
-    follow = memo.setdefault(s, set())
+def first_of_remainder(production, start, productions, first):
+    # FIRST(production[start:]) without ε, and whether that remainder can vanish
+    lookahead = set()
+    for next_idx in range(start, len(production)):
+        next_symbol = production[next_idx]
 
-    if s not in productions:
-        return follow
+        if next_symbol == EPSILON:
+            continue
 
-    if s in visiting:
-        return follow
+        if next_symbol in productions:
+            symbol_first = first[next_symbol]
+            lookahead.update(symbol_first - {EPSILON})
+            if EPSILON in symbol_first:
+                continue
+        else:
+            lookahead.add(next_symbol)
+        return lookahead, False
 
-    visiting.add(s)
+    return lookahead, True
 
-    if s == start_symbol:
-        follow.add('$')
 
-    for head, rules in productions.items():
-        for production in rules:
-            indices = [idx for idx, symbol in enumerate(production) if symbol == s]
-            for idx in indices:
-                if idx == len(production) - 1:
-                    if head != s:
-                        follow.update(
-                            cal_follow(head, productions, first, memo, visiting, start_symbol)
-                        )
-                else:
-                    next_idx = idx + 1
-                    while next_idx < len(production):
-                        next_symbol = production[next_idx]
-
-                        if next_symbol == EPSILON:
-                            next_idx += 1
-                            continue
-
-                        if next_symbol in productions:
-                            symbol_first = first[next_symbol]
-                            follow.update(symbol_first - {EPSILON})
-                            if EPSILON in symbol_first:
-                                next_idx += 1
-                                continue
-                        else:
-                            follow.add(next_symbol)
-                        break
-                    else:
-                        if head != s:
-                            follow.update(
-                                cal_follow(head, productions, first, memo, visiting, start_symbol)
-                            )
-
-    visiting.remove(s)
+def compute_all_follow(productions, first, start_symbol, occurrences):
+    follow = {s: set() for s in productions}
+    follow[start_symbol].add('$')
+
+    # dependents[head]: symbols s whose FOLLOW(s) receives FOLLOW(head)
+    dependents = {s: set() for s in productions}
+    for s in productions:
+        for head, production, idx in occurrences.get(s, ()):
+            lookahead, nullable = first_of_remainder(production, idx + 1, productions, first)
+            follow[s].update(lookahead)
+            if nullable and head != s:
+                dependents[head].add(s)
+
+    worklist = deque(productions)
+    in_queue = set(productions)
+
+    while worklist:
+        head = worklist.popleft()
+        in_queue.discard(head)
+
+        for s in dependents[head]:
+            target = follow[s]
+            before = len(target)
+            target.update(follow[head])
+            if len(target) != before and s not in in_queue:
+                in_queue.add(s)
+                worklist.append(s)
+
     return follow
 
 
@@ -155,6 +163,49 @@ def parse_grammar(grammar_path):
     return productions
 
 
+def grammar_cache_path(grammar_path):
+    try:
+        grammar_bytes = grammar_path.read_bytes()
+        module_bytes = Path(__file__).read_bytes()
+        cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    except (OSError, RuntimeError):
+        return None
+
+    signature = hashlib.blake2b(module_bytes)
+    signature.update(grammar_bytes)
+    return Path(cache_home) / "cd-lab" / f"{signature.hexdigest()}.pkl"
+
+
+def load_cached_analysis(cache_path, expected_length):
+    try:
+        with cache_path.open("rb") as handle:
+            cached = pickle.load(handle)
+    except Exception:
+        return None
+
+    if not isinstance(cached, tuple) or len(cached) != expected_length:
+        return None
+    return cached
+
+
+def store_cached_analysis(cache_path, analysis):
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=cache_path.parent, suffix=".tmp")
+    except OSError:
+        return
+
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            pickle.dump(analysis, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_name, cache_path)
+    except OSError:
+        try:
+            os.unlink(temp_name)
+        except OSError:
+            pass
+
+
 def display_sets(title, sets_dict):
     if title:
         print(title)
@@ -169,22 +220,26 @@ def main():
     else:
         grammar_path = Path(__file__).with_name("grammar.txt")
 
-    try:
-        productions = parse_grammar(grammar_path)
-    except (OSError, ValueError) as error:
-        print(f"Error: {error}")
-        return
+    cache_path = grammar_cache_path(grammar_path)
+    cached = load_cached_analysis(cache_path, 2) if cache_path else None
 
-    first = {}
-    first_memo = {}
-    for s in productions:
-        first[s] = cal_first(s, productions, first_memo)
+    if cached is None:
+        try:
+            productions = parse_grammar(grammar_path)
+        except (OSError, ValueError) as error:
+            print(f"Error: {error}")
+            return
 
-    follow = {}
-    follow_memo = {}
-    start_symbol = next(iter(productions))
-    for s in productions:
-        follow[s] = cal_follow(s, productions, first, follow_memo, start_symbol=start_symbol)
+        first = compute_all_first(productions)
+
+        start_symbol = next(iter(productions))
+        occurrences = index_occurrences(productions)
+        follow = compute_all_follow(productions, first, start_symbol, occurrences)
+
+        if cache_path:
+            store_cached_analysis(cache_path, (first, follow))
+    else:
+        first, follow = cached
 
     print("FIRST sets:")
     display_sets("", first)
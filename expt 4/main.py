@@ -1,13 +1,20 @@
 from __future__ import annotations
 
+import functools
+import hashlib
+import os
+import pickle
 import sys
-from collections import defaultdict
+import tempfile
+from collections import defaultdict, deque
 from pathlib import Path
-from typing import DefaultDict, Dict, Iterable, List, Sequence, Set
+from typing import Any, DefaultDict, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 
 EPSILON = "ε"
 EPSILON_TOKENS = {EPSILON, "#", "epsilon", "EPSILON", "lambda", "Λ"}
+END_MARKER = "$"
+EPSILON_MASK = 1
 
 
 class GrammarParseError(Exception):
@@ -62,11 +69,11 @@ def parse_grammar_file(path: Path) -> tuple[Dict[str, List[List[str]]], str]:
 
 	productions: DefaultDict[str, List[List[str]]] = defaultdict(list)
 	nonterminals = {lhs for lhs, _, _ in entries}
-	sorted_nonterminals = sorted(nonterminals, key=len, reverse=True)
+	automaton = get_automaton(frozenset(nonterminals))
 
 	for lhs, alternatives, line_no in entries:
 		for alt in alternatives:
-			symbols = tokenize_alternative(alt, nonterminals, sorted_nonterminals)
+			symbols = tokenize_alternative(alt, nonterminals, automaton)
 			if not symbols:
 				raise GrammarParseError(
 					f"Line {line_no}: Unable to parse production '{alt}' for '{lhs}'."
@@ -76,10 +83,66 @@ def parse_grammar_file(path: Path) -> tuple[Dict[str, List[List[str]]], str]:
 	return dict(productions), start_symbol
 
 
+class NonterminalAutomaton:
+	"""Aho–Corasick automaton over the non-terminal names of a grammar."""
+
+	def __init__(self, nonterminals: Iterable[str]):
+		self.goto: List[Dict[str, int]] = [{}]
+		self.fail: List[int] = [0]
+		# lengths[node] holds the length of every name ending at node, via fail links too.
+		self.lengths: List[List[int]] = [[]]
+
+		for nonterminal in nonterminals:
+			node = 0
+			for char in nonterminal:
+				child = self.goto[node].get(char)
+				if child is None:
+					child = len(self.goto)
+					self.goto.append({})
+					self.fail.append(0)
+					self.lengths.append([])
+					self.goto[node][char] = child
+				node = child
+			self.lengths[node].append(len(nonterminal))
+
+		queue = deque(self.goto[0].values())
+		while queue:
+			node = queue.popleft()
+			for char, child in self.goto[node].items():
+				queue.append(child)
+				fallback = self.fail[node]
+				while fallback and char not in self.goto[fallback]:
+					fallback = self.fail[fallback]
+				self.fail[child] = self.goto[fallback].get(char, 0)
+				self.lengths[child].extend(self.lengths[self.fail[child]])
+
+	def longest_matches(self, text: str) -> List[int]:
+		"""Return, per index of ``text``, the length of the longest name starting there."""
+		goto, fail, lengths = self.goto, self.fail, self.lengths
+		longest = [0] * len(text)
+		node = 0
+
+		for end, char in enumerate(text):
+			while node and char not in goto[node]:
+				node = fail[node]
+			node = goto[node].get(char, 0)
+			for length in lengths[node]:
+				start = end - length + 1
+				if length > longest[start]:
+					longest[start] = length
+
+		return longest
+
+
+@functools.lru_cache(maxsize=64)
+def get_automaton(nonterminals: frozenset[str]) -> NonterminalAutomaton:
+	return NonterminalAutomaton(nonterminals)
+
+
 def tokenize_alternative(
 	alternative: str,
 	nonterminals: Set[str],
-	sorted_nonterminals: Sequence[str],
+	automaton: NonterminalAutomaton,
 ) -> List[str]:
 	tokens: List[str] = []
 	parts = alternative.split()
@@ -88,7 +151,7 @@ def tokenize_alternative(
 		return [EPSILON]
 
 	for part in parts:
-		tokens.extend(split_token(part, nonterminals, sorted_nonterminals))
+		tokens.extend(split_token(part, nonterminals, automaton))
 
 	normalized = [normalize_symbol(token) for token in tokens if token]
 	return normalized or [EPSILON]
@@ -97,7 +160,7 @@ def tokenize_alternative(
 def split_token(
 	token: str,
 	nonterminals: Set[str],
-	sorted_nonterminals: Sequence[str],
+	automaton: NonterminalAutomaton,
 ) -> List[str]:
 	if not token:
 		return []
@@ -108,26 +171,22 @@ def split_token(
 	if token in nonterminals:
 		return [token]
 
+	# One sweep finds the longest non-terminal starting at every index; the
+	# text between two such starts is a single terminal chunk.
+	longest = automaton.longest_matches(token)
 	symbols: List[str] = []
 	index = 0
 	length = len(token)
 
 	while index < length:
-		match = None
-		for nonterminal in sorted_nonterminals:
-			if token.startswith(nonterminal, index):
-				match = nonterminal
-				break
-
-		if match:
-			symbols.append(match)
-			index += len(match)
+		match_length = longest[index]
+		if match_length:
+			symbols.append(token[index : index + match_length])
+			index += match_length
 			continue
 
 		lookahead = index + 1
-		while lookahead < length and not any(
-			token.startswith(nt, lookahead) for nt in sorted_nonterminals
-		):
+		while lookahead < length and not longest[lookahead]:
 			lookahead += 1
 
 		symbols.append(token[index:lookahead])
@@ -140,123 +199,247 @@ def is_nonterminal(symbol: str, grammar: Dict[str, List[List[str]]]) -> bool:
 	return symbol in grammar
 
 
-def compute_first_sets(grammar: Dict[str, List[List[str]]]) -> Dict[str, Set[str]]:
-	first_sets: Dict[str, Set[str]] = {nt: set() for nt in grammar}
-	changed = True
+class ProductionTable:
+	"""Integer-encoded productions plus the FIRST mask of every production suffix.
+
+	Symbols are interned to small ids (ε is 0, then terminals, the end marker and
+	non-terminals) and a set of symbols is an ``int`` with bit ``i`` set for id ``i``.
+	"""
+
+	def __init__(self, grammar: Dict[str, List[List[str]]]):
+		self.grammar = grammar
+
+		terminals = sorted(
+			{
+				symbol
+				for production_list in grammar.values()
+				for production in production_list
+				for symbol in production
+				if symbol != EPSILON and not is_nonterminal(symbol, grammar)
+			}
+		)
+		self.sym_id: Dict[str, int] = {}
+		for symbol in (EPSILON, *terminals, END_MARKER, *grammar):
+			self.sym_id.setdefault(symbol, len(self.sym_id))
+		self.symbols: List[str] = list(self.sym_id)
+		self.is_nonterminal: List[bool] = [
+			is_nonterminal(symbol, grammar) for symbol in self.symbols
+		]
+
+		# Identical bodies are stored once; prod_heads[id] lists every head using one.
+		self.prod_interner: Dict[Tuple[int, ...], int] = {}
+		self.prod_heads: List[List[int]] = []
+		self.prod_codes: List[Tuple[int, ...]] = []
+		self.by_head: Dict[int, List[int]] = {self.sym_id[nt]: [] for nt in grammar}
+		# occurrences[B] lists every (production id, index) where B appears.
+		self.occurrences: Dict[int, List[Tuple[int, int]]] = {
+			self.sym_id[nt]: [] for nt in grammar
+		}
 
-	while changed:
-		changed = False
-		for non_terminal, production_list in grammar.items():
+		for head, production_list in grammar.items():
+			head_id = self.sym_id[head]
 			for production in production_list:
-				if production == [EPSILON]:
-					if EPSILON not in first_sets[non_terminal]:
-						first_sets[non_terminal].add(EPSILON)
-						changed = True
-					continue
-
-				derives_epsilon = True
-				for symbol in production:
-					symbol_first: Set[str]
-
-					if symbol == EPSILON:
-						symbol_first = {EPSILON}
-					elif is_nonterminal(symbol, grammar):
-						symbol_first = first_sets[symbol]
-					else:
-						symbol_first = {symbol}
-
-					before_size = len(first_sets[non_terminal])
-					first_sets[non_terminal].update(symbol_first - {EPSILON})
-					if len(first_sets[non_terminal]) != before_size:
-						changed = True
-
-					if EPSILON not in symbol_first:
-						derives_epsilon = False
-						break
+				codes = tuple(self.sym_id[symbol] for symbol in production)
+				production_id = self.prod_interner.get(codes)
+				if production_id is None:
+					production_id = len(self.prod_codes)
+					self.prod_interner[codes] = production_id
+					self.prod_heads.append([])
+					self.prod_codes.append(codes)
+					for index, code in enumerate(codes):
+						if self.is_nonterminal[code]:
+							self.occurrences[code].append((production_id, index))
+
+				if production_id not in self.by_head[head_id]:
+					self.prod_heads[production_id].append(head_id)
+					self.by_head[head_id].append(production_id)
+
+		# suffix_first[id][i] is the FIRST mask of production[i:]; past the end it is {ε}.
+		self.suffix_first: List[List[int]] = [
+			[0] * len(codes) + [EPSILON_MASK] for codes in self.prod_codes
+		]
+		# stale[id] is the highest suffix index that must be recomputed, -1 when current.
+		self.stale: List[int] = [len(codes) - 1 for codes in self.prod_codes]
+
+	def invalidate(self, symbol: int):
+		for production_id, index in self.occurrences[symbol]:
+			if index > self.stale[production_id]:
+				self.stale[production_id] = index
+
+	def refresh(self, production_id: int, first_masks: List[int]):
+		stale_index = self.stale[production_id]
+		if stale_index < 0:
+			return
+
+		codes = self.prod_codes[production_id]
+		suffix_first = self.suffix_first[production_id]
+
+		for index in range(stale_index, -1, -1):
+			symbol_first = first_masks[codes[index]]
+			if symbol_first & EPSILON_MASK:
+				symbol_first = symbol_first & ~EPSILON_MASK | suffix_first[index + 1]
+			suffix_first[index] = symbol_first
+
+		self.stale[production_id] = -1
+
+	def decode(self, mask: int) -> Set[str]:
+		return {self.symbols[i] for i in range(mask.bit_length()) if mask >> i & 1}
+
+	def as_sets(self, masks: List[int]) -> Dict[str, Set[str]]:
+		return {nt: self.decode(masks[self.sym_id[nt]]) for nt in self.grammar}
+
+
+def compute_first_sets(table: ProductionTable) -> List[int]:
+	# Terminals (and ε) are their own FIRST set; non-terminals start out empty.
+	first_masks = [
+		0 if nonterminal else 1 << code
+		for code, nonterminal in enumerate(table.is_nonterminal)
+	]
+
+	worklist = deque(table.by_head)
+	in_queue = set(table.by_head)
+
+	while worklist:
+		non_terminal = worklist.popleft()
+		in_queue.discard(non_terminal)
+
+		old = first_masks[non_terminal]
+		new = old
+		for production_id in table.by_head[non_terminal]:
+			new |= first_of_sequence(table, production_id, 0, first_masks)
+
+		if new == old:
+			continue
+		first_masks[non_terminal] = new
 
-				if derives_epsilon:
-					if EPSILON not in first_sets[non_terminal]:
-						first_sets[non_terminal].add(EPSILON)
-						changed = True
+		# Only the suffixes mentioning this non-terminal went out of date, and only
+		# their heads have to be revisited.
+		table.invalidate(non_terminal)
+		for production_id, _ in table.occurrences[non_terminal]:
+			for dependent in table.prod_heads[production_id]:
+				if dependent not in in_queue:
+					in_queue.add(dependent)
+					worklist.append(dependent)
 
-	return first_sets
+	return first_masks
 
 
 def first_of_sequence(
-	sequence: Sequence[str],
-	first_sets: Dict[str, Set[str]],
-	grammar: Dict[str, List[List[str]]],
-) -> Set[str]:
-	if not sequence:
-		return {EPSILON}
-
-	result: Set[str] = set()
-
-	for symbol in sequence:
-		if symbol == EPSILON:
-			result.add(EPSILON)
-			continue
+	table: ProductionTable,
+	production_id: int,
+	start: int,
+	first_masks: List[int],
+) -> int:
+	table.refresh(production_id, first_masks)
+	return table.suffix_first[production_id][start]
 
-		if is_nonterminal(symbol, grammar):
-			symbol_first = first_sets[symbol]
-		else:
-			symbol_first = {symbol}
 
-		result.update(symbol_first - {EPSILON})
+def compute_follow_sets(
+	table: ProductionTable,
+	first_masks: List[int],
+	start_symbol: str,
+) -> List[int]:
+	follow_masks = [0] * len(table.symbols)
+	follow_masks[table.sym_id[start_symbol]] = 1 << table.sym_id[END_MARKER]
+
+	# follow_consumers[A]: positions where FOLLOW(A) flows into FOLLOW(B)
+	follow_consumers: Dict[int, List[Tuple[int, int]]] = {nt: [] for nt in table.by_head}
+	for production_id, codes in enumerate(table.prod_codes):
+		table.refresh(production_id, first_masks)
+		seq_first = table.suffix_first[production_id]
+		heads = table.prod_heads[production_id]
+		for index, symbol in enumerate(codes):
+			if not table.is_nonterminal[symbol]:
+				continue
 
-		if EPSILON not in symbol_first:
-			break
-	else:
-		result.add(EPSILON)
+			lookahead_first = seq_first[index + 1]
+			follow_masks[symbol] |= lookahead_first & ~EPSILON_MASK
+			if lookahead_first & EPSILON_MASK:
+				for head in heads:
+					if head != symbol:
+						follow_consumers[head].append((production_id, index))
+
+	worklist = deque(nt for nt in table.by_head if follow_masks[nt])
+	in_queue = set(worklist)
+
+	while worklist:
+		head = worklist.popleft()
+		in_queue.discard(head)
+
+		incoming = follow_masks[head]
+		for production_id, index in follow_consumers[head]:
+			symbol = table.prod_codes[production_id][index]
+			old = follow_masks[symbol]
+			new = old | incoming
+			if new == old:
+				continue
 
-	return result
+			follow_masks[symbol] = new
+			if symbol not in in_queue:
+				in_queue.add(symbol)
+				worklist.append(symbol)
 
+	return follow_masks
 
-def update_set(target: Set[str], additions: Iterable[str]) -> bool:
-	before = len(target)
-	target.update(additions)
-	return len(target) != before
 
+def sorted_symbols(symbols: Set[str]) -> List[str]:
+	# ε first, then the rest in plain string order, without a composite sort key.
+	ordered = sorted(symbols - {EPSILON})
+	return [EPSILON, *ordered] if EPSILON in symbols else ordered
 
-def compute_follow_sets(
-	grammar: Dict[str, List[List[str]]],
-	first_sets: Dict[str, Set[str]],
-	start_symbol: str,
-) -> Dict[str, Set[str]]:
-	follow_sets: Dict[str, Set[str]] = {nt: set() for nt in grammar}
-	follow_sets[start_symbol].add("$")
 
-	changed = True
-	while changed:
-		changed = False
-		for head, production_list in grammar.items():
-			for production in production_list:
-				for index, symbol in enumerate(production):
-					if not is_nonterminal(symbol, grammar):
-						continue
+def display_sets(title: str, sets: Dict[str, Set[str]]):
+	lines = [title]
+	lines.extend(
+		f"  {non_terminal}: {{ {', '.join(sorted_symbols(sets[non_terminal])) or '∅'} }}"
+		for non_terminal in sorted(sets)
+	)
+	print("\n".join(lines))
 
-					remainder = production[index + 1 :]
-					lookahead_first = first_of_sequence(remainder, first_sets, grammar)
 
-					if update_set(follow_sets[symbol], lookahead_first - {EPSILON}):
-						changed = True
+def grammar_cache_path(grammar_path: Path) -> Optional[Path]:
+	# The key covers this script's own source too, so any code change invalidates old entries.
+	try:
+		grammar_bytes = grammar_path.read_bytes()
+		module_bytes = Path(__file__).read_bytes()
+		cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+	except (OSError, RuntimeError):
+		return None
 
-					if not remainder or EPSILON in lookahead_first:
-						if update_set(follow_sets[symbol], follow_sets[head]):
-							changed = True
+	signature = hashlib.blake2b(module_bytes)
+	signature.update(grammar_bytes)
+	return Path(cache_home) / "cd-lab" / f"{signature.hexdigest()}.pkl"
 
-	return follow_sets
 
+def load_cached_analysis(cache_path: Path, expected_length: int) -> Optional[tuple]:
+	# Anything unreadable or of the wrong shape is just a cache miss.
+	try:
+		with cache_path.open("rb") as handle:
+			cached = pickle.load(handle)
+	except Exception:
+		return None
 
-def sorted_symbols(symbols: Iterable[str]) -> List[str]:
-	return sorted(symbols, key=lambda sym: (sym != EPSILON, sym))
+	if not isinstance(cached, tuple) or len(cached) != expected_length:
+		return None
+	return cached
 
 
-def display_sets(title: str, sets: Dict[str, Set[str]]):
-	print(title)
-	for non_terminal in sorted(sets.keys()):
-		members = ", ".join(sorted_symbols(sets[non_terminal])) or "∅"
-		print(f"  {non_terminal}: {{ {members} }}")
+def store_cached_analysis(cache_path: Path, analysis: Any):
+	try:
+		cache_path.parent.mkdir(parents=True, exist_ok=True)
+		fd, temp_name = tempfile.mkstemp(dir=cache_path.parent, suffix=".tmp")
+	except OSError:
+		return
+
+	try:
+		with os.fdopen(fd, "wb") as handle:
+			pickle.dump(analysis, handle, protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(temp_name, cache_path)
+	except OSError:
+		try:
+			os.unlink(temp_name)
+		except OSError:
+			pass
 
 
 def resolve_grammar_path(argv: Sequence[str]) -> Path:
@@ -268,21 +451,33 @@ def resolve_grammar_path(argv: Sequence[str]) -> Path:
 def main(argv: Sequence[str]) -> int:
 	grammar_path = resolve_grammar_path(argv)
 
-	try:
-		grammar, start_symbol = parse_grammar_file(grammar_path)
-	except GrammarParseError as error:
-		print(f"Error: {error}")
-		return 1
+	cache_path = grammar_cache_path(grammar_path)
+	cached = load_cached_analysis(cache_path, 4) if cache_path else None
+
+	if cached is None:
+		try:
+			grammar, start_symbol = parse_grammar_file(grammar_path)
+		except GrammarParseError as error:
+			print(f"Error: {error}")
+			return 1
+
+		table = ProductionTable(grammar)
+		first_masks = compute_first_sets(table)
+		follow_masks = compute_follow_sets(table, first_masks, start_symbol)
+
+		if cache_path:
+			store_cached_analysis(cache_path, (grammar, start_symbol, first_masks, follow_masks))
+	else:
+		# Symbol ids only depend on the grammar, so the masks decode against a fresh table.
+		grammar, start_symbol, first_masks, follow_masks = cached
+		table = ProductionTable(grammar)
 
 	print(f"Grammar loaded from: {grammar_path}")
 	print(f"Start symbol: {start_symbol}\n")
 
-	first_sets = compute_first_sets(grammar)
-	follow_sets = compute_follow_sets(grammar, first_sets, start_symbol)
-
-	display_sets("FIRST sets:", first_sets)
+	display_sets("FIRST sets:", table.as_sets(first_masks))
 	print()
-	display_sets("FOLLOW sets:", follow_sets)
+	display_sets("FOLLOW sets:", table.as_sets(follow_masks))
 
 	return 0
 
@@ -1,4 +1,5 @@
 from collections import defaultdict
+from itertools import islice
 import os
 
 def read_grammar(filename):
@@ -15,21 +16,73 @@ def read_grammar(filename):
         exit(1)
     return grammar
 
+def expand_earlier(nt, productions, earlier, new_grammar):
+    # Rewrite Ai -> Aj γ as Ai -> δ γ for every (already rewritten) Aj -> δ until no
+    # production of Ai starts with an earlier Aj. An ε-body can expose another earlier
+    # non-terminal from γ, so every result is examined again.
+    # guard[Aj] is the length of the γ that followed Aj when it was expanded: a leading Aj
+    # sitting in front of more than that came out of Aj itself (Aj =>+ Aj ... through
+    # ε-productions), which this algorithm cannot remove, so it is reported and kept.
+    expanded = []
+    pending = [(p, {}) for p in reversed(productions)]
+    while pending:
+        p, guard = pending.pop()
+        head = p[0]
+        if head not in earlier:
+            expanded.append(p)
+            continue
+        guard = {a: tail for a, tail in guard.items() if tail < len(p)}
+        if head in guard:
+            print(f"Warning: {head} is left-recursive through ε-productions; "
+                  f"{nt} -> {' '.join(p)} is kept as is")
+            expanded.append(p)
+            continue
+        guard[head] = len(p) - 1
+        for delta in reversed(new_grammar[head]):
+            q = [] if delta == ['ε'] else list(delta)
+            q.extend(islice(p, 1, None))
+            pending.append((q or ['ε'], guard))
+    return expanded
+
 def eliminate_left_recursion(grammar):
+    # Paull's algorithm: fix the order A1..An once, expand every Ai -> Aj γ with j < i,
+    # then remove the direct left recursion that is left on Ai
+    order = tuple(grammar.keys())
     new_grammar = defaultdict(list)
-    for nt in list(grammar.keys()):  
-        alpha = [p[1:] for p in grammar[nt] if p and p[0] == nt]
-        beta = [p for p in grammar[nt] if p and p[0] != nt]
-        if alpha:
-            # Left recursion found: create A' and transform
-            new_nt = nt + "'"
-            # A -> βA' (or A -> A' if no β)
-            new_grammar[nt] = [p + [new_nt] for p in beta] if beta else [[new_nt]]
-            # A' -> αA' | ε
-            new_grammar[new_nt] = [p + [new_nt] for p in alpha] + [['ε']]
-        else:
-            # No left recursion: copy productions
-            new_grammar[nt] = grammar[nt]
+    for i, nt in enumerate(order):
+        # Work on fresh lists so the input grammar is never aliased or mutated; an empty
+        # alternative (A -> c |) is the ε-production
+        productions = [list(p) or ['ε'] for p in grammar[nt]]
+        productions = expand_earlier(nt, productions, set(order[:i]), new_grammar)
+
+        # A -> A alone adds nothing and is dropped
+        alpha = [p for p in productions if len(p) > 1 and p[0] == nt]
+        beta = [p for p in productions if p[0] != nt]
+        if not alpha:
+            # No left recursion (at most a bare A -> A): keep the β productions
+            if not beta:
+                print(f"Warning: {nt} -> {nt} is the only production of {nt}; "
+                      f"{nt} derives no string and is left without productions")
+            new_grammar[nt] = beta
+            continue
+
+        # Left recursion found: create A' and transform
+        new_nt = nt + "'"
+        while new_nt in grammar or new_nt in new_grammar:
+            new_nt += "'"
+        # A -> βA' (or A -> A' if no β)
+        for p in beta:
+            if p == ['ε']:
+                p[0] = new_nt
+            else:
+                p.append(new_nt)
+        new_grammar[nt] = beta or [[new_nt]]
+        # A' -> αA' | ε
+        for p in alpha:
+            del p[0]
+            p.append(new_nt)
+        alpha.append(['ε'])
+        new_grammar[new_nt] = alpha
     return new_grammar
 
 def print_grammar(grammar):
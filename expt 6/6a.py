@@ -1,100 +1,167 @@
 import sys
+from collections import deque
+from dataclasses import dataclass, field
+
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:  # numpy/numba are optional; run_parser then stays plain Python
+    np = None
+    njit = None
 
 EPSILON = '#'
 END_MARKER = '$'
 PRODUCTION_ARROW = '->'
 PRODUCTION_SEPARATOR = '|'
 
-grammar = {}
-first_sets = {}
-follow_sets = {}
-terminals = set()
-non_terminals = set()
-parsing_table = {}
+# Symbol kinds of the integer-encoded parser
+KIND_NT = 0
+KIND_T = 1
+KIND_END = 2
+KIND_OTHER = 3
+
+# run_parser outcomes
+PARSE_ACCEPT = 0
+PARSE_MISMATCH = 1
+PARSE_NO_ENTRY = 2
+PARSE_UNKNOWN_SYMBOL = 3
+PARSE_STACK_EMPTY = 4
+PARSE_STACK_FULL = 5
+
+# Everything built from one grammar, passed explicitly instead of living in module globals
+@dataclass(slots=True)
+class ParserContext:
+    grammar: dict = field(default_factory=dict)            # head -> list of production ids
+    prod_interner: dict = field(default_factory=dict)      # production body (tuple) -> production id
+    production_bodies: list = field(default_factory=list)  # production id -> list of symbols
+    production_first: dict = field(default_factory=dict)   # production id -> FIRST of the whole body
+    first_sets: dict = field(default_factory=dict)
+    follow_sets: dict = field(default_factory=dict)
+    terminals: set = field(default_factory=set)
+    non_terminals: set = field(default_factory=set)
+    parsing_table: dict = field(default_factory=dict)
+    kind: dict = field(default_factory=dict)                # symbol -> KIND_* (filled by classify_symbols)
+    # Integer-encoded parser state (filled by encode_parsing_table)
+    symbol_ids: dict = field(default_factory=dict)
+    symbol_names: list = field(default_factory=list)
+    symbol_kind: list = field(default_factory=list)
+    table_flat: list = field(default_factory=list)
 
 # FIRST computation
-def compute_first(symbol):
+def compute_first(ctx, symbol):
+    first_sets = ctx.first_sets
+    grammar = ctx.grammar
     if symbol in first_sets:
         return first_sets[symbol]
 
     first = set()
+    kind = ctx.kind.get(symbol, KIND_OTHER)
 
     # Terminal or epsilon
-    if symbol in terminals:
+    if kind == KIND_T:
         first.add(symbol)
     elif symbol == EPSILON:
         first.add(EPSILON)
     # Non-terminal
-    elif symbol in grammar:
-        for production in grammar.get(symbol, []):
-            if production == [EPSILON]:
-                first.add(EPSILON)
-            else:
-                for sym in production:
-                    sym_first = compute_first(sym)
-                    first.update(sym_first - {EPSILON})
-                    if EPSILON not in sym_first:
-                        break
-                else:
-                    first.add(EPSILON)
+    elif kind == KIND_NT:
+        for prod_id in grammar.get(symbol, []):
+            first.update(compute_first_of_production(ctx, prod_id))
 
     first_sets[symbol] = first
     return first
 
-def compute_first_of_sequence(sequence):
+# Bodies shared by several heads get their FIRST computed once
+def compute_first_of_production(ctx, prod_id):
+    production_first = ctx.production_first
+    if prod_id not in production_first:
+        production_first[prod_id] = compute_first_of_sequence(ctx, ctx.production_bodies[prod_id])
+    return production_first[prod_id]
+
+def intern_production(ctx, symbols):
+    prod_interner = ctx.prod_interner
+    production_bodies = ctx.production_bodies
+    key = tuple(symbols)
+    if key not in prod_interner:
+        prod_interner[key] = len(production_bodies)
+        production_bodies.append(symbols)
+    return prod_interner[key]
+
+def compute_first_of_sequence(ctx, sequence):
     if not sequence:
         return {EPSILON}
     result = set()
     for sym in sequence:
-        sym_first = compute_first(sym)
+        sym_first = compute_first(ctx, sym)
         result.update(sym_first - {EPSILON})
         if EPSILON not in sym_first:
             return result
     result.add(EPSILON)
     return result
 
-# FOLLOW computation (Iterative algorithm)
-def compute_all_follow_sets(start_symbol):
+# FOLLOW computation (worklist algorithm)
+def compute_all_follow_sets(ctx, start_symbol):
+    grammar = ctx.grammar
+    production_bodies = ctx.production_bodies
+    follow_sets = ctx.follow_sets
+    non_terminals = ctx.non_terminals
+
     # initialize
     for nt in non_terminals:
         follow_sets[nt] = set()
     follow_sets[start_symbol].add(END_MARKER)
 
-    updated = True
-    while updated:
-        updated = False
-        # For each production A -> alpha
-        for A, productions in grammar.items():
-            for prod in productions:
-                prod_len = len(prod)
-                for i, B in enumerate(prod):
-                    if B not in non_terminals:
-                        continue
-                    # beta is the sequence after B
-                    beta = prod[i+1:] if i+1 < prod_len else []
-                    first_beta = compute_first_of_sequence(beta)
-                    # Add FIRST(beta) - {EPSILON} to FOLLOW(B)
-                    to_add = (first_beta - {EPSILON})
-                    if not to_add.issubset(follow_sets[B]):
-                        follow_sets[B].update(to_add)
-                        updated = True
-                    # If beta is empty OR FIRST(beta) contains EPSILON, add FOLLOW(A) to FOLLOW(B)
-                    if (not beta) or (EPSILON in first_beta):
-                        if not follow_sets[A].issubset(follow_sets[B]):
-                            follow_sets[B].update(follow_sets[A])
-                            updated = True
+    # follow_consumers[A]: (prod_id, i) positions where FOLLOW(A) flows into FOLLOW(B)
+    follow_consumers = {nt: [] for nt in non_terminals}
+    first_beta_cache = {}
+    nullable_beta_cache = {}
+    for A, prod_ids in grammar.items():
+        for prod_id in prod_ids:
+            prod = production_bodies[prod_id]
+            for i, B in enumerate(prod):
+                if B not in non_terminals:
+                    continue
+                key = (prod_id, i + 1)
+                if key not in first_beta_cache:
+                    first_beta = compute_first_of_sequence(ctx, prod[i+1:])
+                    first_beta_cache[key] = frozenset(first_beta - {EPSILON})
+                    nullable_beta_cache[key] = EPSILON in first_beta
+                # Add FIRST(beta) - {EPSILON} to FOLLOW(B), beta being the sequence after B
+                follow_sets[B] |= first_beta_cache[key]
+                # If beta is empty OR FIRST(beta) contains EPSILON, FOLLOW(A) feeds FOLLOW(B)
+                if nullable_beta_cache[key] and A != B:
+                    follow_consumers[A].append((prod_id, i))
+
+    worklist = deque(nt for nt in non_terminals if follow_sets[nt])
+    in_queue = set(worklist)
+
+    while worklist:
+        A = worklist.popleft()
+        in_queue.discard(A)
+
+        follow_A = follow_sets[A]
+        for prod_id, i in follow_consumers[A]:
+            B = production_bodies[prod_id][i]
+            follow_B = follow_sets[B]
+            # Sets only grow, so a size change is exactly "something was added"
+            before = len(follow_B)
+            follow_B |= follow_A
+            if len(follow_B) != before and B not in in_queue:
+                in_queue.add(B)
+                worklist.append(B)
 
 # Parsing table construction
-def construct_parsing_table(start_symbol):
-    all_terminals = sorted(list(terminals)) + [END_MARKER]
-    for nt in non_terminals:
+def construct_parsing_table(ctx, start_symbol):
+    parsing_table = ctx.parsing_table
+    all_terminals = sorted(list(ctx.terminals)) + [END_MARKER]
+    for nt in ctx.non_terminals:
         parsing_table[nt] = {}
         for t in all_terminals:
             parsing_table[nt][t] = None  # None signifies an error
 
-    for nt, productions in grammar.items():
-        for prod in productions:
-            first_of_prod = compute_first_of_sequence(prod)
+    for nt, prod_ids in ctx.grammar.items():
+        for prod_id in prod_ids:
+            prod = ctx.production_bodies[prod_id]
+            first_of_prod = compute_first_of_production(ctx, prod_id)
             for terminal in (first_of_prod - {EPSILON}):
                 if parsing_table[nt][terminal] is not None:
                     print(f"Error: LL(1) conflict at M[{nt}, {terminal}]!")
@@ -104,7 +171,7 @@ def construct_parsing_table(start_symbol):
                 parsing_table[nt][terminal] = prod
 
             if EPSILON in first_of_prod:
-                for terminal in follow_sets[nt]:
+                for terminal in ctx.follow_sets[nt]:
                     if parsing_table[nt][terminal] is not None:
                         print(f"Error: LL(1) conflict at M[{nt}, {terminal}]!")
                         print(f"  Existing: {nt} -> {' '.join(parsing_table[nt][terminal])}")
@@ -113,120 +180,291 @@ def construct_parsing_table(start_symbol):
                     parsing_table[nt][terminal] = prod
     return True
 
-def print_parsing_table():
+def print_parsing_table(ctx):
     print("\n--- Predictive Parsing Table ---")
-    
-    all_terminals = sorted(list(terminals)) + [END_MARKER]
-    
+
+    parsing_table = ctx.parsing_table
+    all_terminals = sorted(list(ctx.terminals)) + [END_MARKER]
+    row_labels = sorted(list(ctx.non_terminals))
+
     # Find max width for the first column (Non-Terminal names)
-    max_nt_len = max(len(nt) for nt in non_terminals)
-    
-    # Calculate widths for each terminal column
-    col_widths = {}
-    for t in all_terminals:
-        # Start with the width of the terminal name itself
-        max_width = len(t)
-        for nt in non_terminals:
-            prod = parsing_table[nt].get(t)
-            if prod:
-                # Use a shorter "-> rule" format to save space
-                prod_str = f"-> {' '.join(prod)}"
-                max_width = max(max_width, len(prod_str))
-        # Add 2 for padding
-        col_widths[t] = max(max_width, len("Error")) + 2
-
-    print(f"{'':<{max_nt_len}} |", end="")
-    for t in all_terminals:
-        print(f" {t:^{col_widths[t]-2}} |", end="")
-    
-    total_width = max_nt_len + 1 + sum(col_widths.values()) + len(all_terminals) * 2
-    print("\n" + "-" * total_width)
-
-    for nt in sorted(list(non_terminals)):
-        print(f"{nt:<{max_nt_len}} |", end="")
+    max_nt_len = max(len(nt) for nt in row_labels)
+
+    # Render every cell once, using a shorter "-> rule" format to save space
+    cells = []
+    for nt in row_labels:
+        row = []
         for t in all_terminals:
             prod = parsing_table[nt].get(t)
-            if prod:
-                prod_str = f"-> {' '.join(prod)}"
-            else:
-                prod_str = "Error"
-            print(f" {prod_str:^{col_widths[t]-2}} |", end="")
-        print() # Newline for next row
+            row.append(f"-> {' '.join(prod)}" if prod else "Error")
+        cells.append(row)
+
+    # Column width is the widest of the terminal name and its cells, plus 2 for padding
+    col_widths = [
+        max(len(t), len("Error"), *map(len, column)) + 2
+        for t, column in zip(all_terminals, zip(*cells))
+    ]
+
+    def format_row(label, entries):
+        padded = (f"{entry:^{width - 2}}" for entry, width in zip(entries, col_widths))
+        return f"{label:<{max_nt_len}} | " + " | ".join(padded) + " |"
+
+    total_width = max_nt_len + 1 + sum(col_widths) + len(all_terminals) * 2
+    lines = [format_row("", all_terminals), "-" * total_width]
+    lines.extend(format_row(nt, row) for nt, row in zip(row_labels, cells))
+    print("\n".join(lines))
+
+# One kind per symbol; terminals win over the end marker and non-terminals,
+# matching the order the parser has always checked them in
+def classify_symbols(ctx):
+    kind = ctx.kind
+    kind[END_MARKER] = KIND_END
+    for symbol in ctx.non_terminals:
+        kind[symbol] = KIND_NT
+    for symbol in ctx.terminals:
+        kind[symbol] = KIND_T
+
+def encode_parsing_table(ctx):
+    terminals = ctx.terminals
+    non_terminals = ctx.non_terminals
+    kind = ctx.kind
+    symbol_ids = ctx.symbol_ids
+    symbol_names = ctx.symbol_names
+    symbol_kind = ctx.symbol_kind
+
+    # Dense ids: non-terminals first so they index table_flat rows directly,
+    # then terminals, the end marker and epsilon
+    for symbol in sorted(non_terminals) + sorted(terminals) + [END_MARKER, EPSILON]:
+        if symbol in symbol_ids:
+            continue
+        symbol_ids[symbol] = len(symbol_names)
+        symbol_names.append(symbol)
+        symbol_kind.append(kind.get(symbol, KIND_OTHER))
+
+    # One extra column for input tokens that are not grammar symbols
+    num_columns = len(symbol_names) + 1
+    for nt in sorted(non_terminals):
+        row = [None] * num_columns
+        for t, prod in ctx.parsing_table[nt].items():
+            if prod is None:
+                continue
+            # The epsilon production pushes nothing
+            row[symbol_ids[t]] = () if prod == [EPSILON] else tuple(symbol_ids[sym] for sym in prod)
+        ctx.table_flat.append(row)
+
+def format_production(ctx, production):
+    return ' '.join(ctx.symbol_names[sym] for sym in production) or EPSILON
+
+def build_parser_arrays(ctx):
+    # Flatten table_flat for run_parser: cells hold a production index (-1 is an error)
+    # and each production's symbols are stored once, in push (reversed) order
+    prod_index = {}
+    prod_concat = []
+    prod_starts = []
+    prod_ends = []
+    table = []
+    for row in ctx.table_flat:
+        encoded_row = []
+        for production in row:
+            if production is None:
+                encoded_row.append(-1)
+                continue
+            if production not in prod_index:
+                prod_index[production] = len(prod_starts)
+                prod_starts.append(len(prod_concat))
+                prod_concat.extend(reversed(production))
+                prod_ends.append(len(prod_concat))
+            encoded_row.append(prod_index[production])
+        table.append(encoded_row)
+
+    if np is None:
+        return table, list(ctx.symbol_kind), prod_concat, prod_starts, prod_ends
+    return (
+        np.array(table, dtype=np.int32),
+        np.array(ctx.symbol_kind, dtype=np.int32),
+        np.array(prod_concat, dtype=np.int32),
+        np.array(prod_starts, dtype=np.int32),
+        np.array(prod_ends, dtype=np.int32),
+    )
+
+# Untraced parser loop: returns (PARSE_* status, input position, top of stack)
+def run_parser(table, kinds, prod_concat, prod_starts, prod_ends, tokens, start_nt, end_id, stack):
+    stack[0] = end_id
+    stack[1] = start_nt
+    sp = 2
+    pos = 0
+    top = start_nt
+    while sp > 0:
+        top = stack[sp - 1]
+        current = tokens[pos]
+        kind = kinds[top]
+        if kind == KIND_T or kind == KIND_END:
+            if top != current:
+                return PARSE_MISMATCH, pos, top
+            sp -= 1
+            pos += 1
+            if top == end_id:
+                return PARSE_ACCEPT, pos, top
+        elif kind == KIND_NT:
+            prod = table[top][current]
+            if prod < 0:
+                return PARSE_NO_ENTRY, pos, top
+            sp -= 1
+            start = prod_starts[prod]
+            end = prod_ends[prod]
+            if sp + end - start > len(stack):
+                return PARSE_STACK_FULL, pos, top
+            for i in range(start, end):
+                stack[sp] = prod_concat[i]
+                sp += 1
+        else:
+            return PARSE_UNKNOWN_SYMBOL, pos, top
+    return PARSE_STACK_EMPTY, pos, top
+
+if njit is not None:
+    run_parser = njit(cache=True)(run_parser)
 
 # Parser driver
-def parse_input_string(input_str, start_symbol):
+def parse_input_string(ctx, input_str, start_symbol, trace=False):
+    symbol_ids = ctx.symbol_ids
+    symbol_names = ctx.symbol_names
+    symbol_kind = ctx.symbol_kind
+    table_flat = ctx.table_flat
+
     print("\n--- Parsing Input String ---")
     print(f"Input: '{input_str}'\n")
 
     tokens = input_str.split() + [END_MARKER]
-    stack = [END_MARKER, start_symbol]
+    unknown_id = len(symbol_names)
+    token_ids = [symbol_ids.get(token, unknown_id) for token in tokens]
+    end_id = symbol_ids[END_MARKER]
+
+    if not trace:
+        return run_untraced(ctx, tokens, token_ids, symbol_ids[start_symbol], end_id)
+
+    stack = [end_id, symbol_ids[start_symbol]]
     input_pointer = 0
 
+    # Pushes and pops only touch stack_names (the name of each stack entry) and
+    # stack_ends[k], the printed width of the stack up to and including stack[k]; the
+    # stack column itself is joined once per printed row. The remaining input is a slice
+    # of the joined tokens starting at token_starts[i]
+    stack_names = [END_MARKER, start_symbol]
+    stack_ends = [len(END_MARKER), len(END_MARKER) + 1 + len(start_symbol)]
+    joined_tokens = ' '.join(tokens)
+    token_starts = []
+    offset = 0
+    for token in tokens:
+        token_starts.append(offset)
+        offset += len(token) + 1
+    input_str_remaining = joined_tokens
+
     # Calculate max stack width for formatting
-    max_stack_width = len(' '.join(stack)) + 20
-    
+    max_stack_width = stack_ends[-1] + 20
+
     print(f"{'Stack':<{max_stack_width}} | {'Input':<30} | {'Action':<40}")
     print("-" * (max_stack_width + 30 + 40 + 6))
 
     while stack:
-        stack_str = ' '.join(stack)
-        input_str_remaining = ' '.join(tokens[input_pointer:])
-
+        step_stack_str = ' '.join(stack_names)
+        step_input_str = input_str_remaining
         top_of_stack = stack[-1]
-        current_input = tokens[input_pointer]
+        current_input = token_ids[input_pointer]
+        kind = symbol_kind[top_of_stack]
 
         # Terminal or end marker on top
-        if top_of_stack in terminals or top_of_stack == END_MARKER:
+        if kind == KIND_T or kind == KIND_END:
             if top_of_stack == current_input:
-                action = f"Match and pop '{current_input}'"
+                action = f"Match and pop '{tokens[input_pointer]}'"
                 stack.pop()
+                stack_names.pop()
+                stack_ends.pop()
                 input_pointer += 1
+                if input_pointer < len(tokens):
+                    input_str_remaining = joined_tokens[token_starts[input_pointer]:]
             else:
-                action = f"Error: Mismatch (Stack: {top_of_stack}, Input: {current_input})"
-                print(f"{stack_str:<{max_stack_width}} | {input_str_remaining:<30} | {action:<40}")
+                action = f"Error: Mismatch (Stack: {symbol_names[top_of_stack]}, Input: {tokens[input_pointer]})"
+                print(f"{step_stack_str:<{max_stack_width}} | {step_input_str:<30} | {action:<40}")
                 print("\nParsing failed: Mismatch error.")
                 return False
 
         # Non-terminal on top
-        elif top_of_stack in non_terminals:
-            production = parsing_table[top_of_stack].get(current_input)
+        elif kind == KIND_NT:
+            production = table_flat[top_of_stack][current_input]
             if production is None:
-                action = f"Error: No table entry for M[{top_of_stack}, {current_input}]"
-                print(f"{stack_str:<{max_stack_width}} | {input_str_remaining:<30} | {action:<40}")
+                action = f"Error: No table entry for M[{symbol_names[top_of_stack]}, {tokens[input_pointer]}]"
+                print(f"{step_stack_str:<{max_stack_width}} | {step_input_str:<30} | {action:<40}")
                 print("\nParsing failed: Syntax error.")
                 return False
 
-            action = f"Apply: {top_of_stack} -> {' '.join(production)}"
+            action = f"Apply: {symbol_names[top_of_stack]} -> {format_production(ctx, production)}"
             stack.pop()
-            if production != [EPSILON]:
+            stack_names.pop()
+            stack_ends.pop()
+            if production:
                 for symbol in reversed(production):
                     stack.append(symbol)
-                
+                    name = symbol_names[symbol]
+                    stack_names.append(name)
+                    stack_ends.append(stack_ends[-1] + 1 + len(name) if stack_ends else len(name))
+
                 # Update max stack width if it grew
-                stack_str_len = len(' '.join(stack))
-                if stack_str_len > max_stack_width - 5:
-                    max_stack_width = stack_str_len + 10
+                if stack_ends[-1] > max_stack_width - 5:
+                    max_stack_width = stack_ends[-1] + 10
         else:
-            action = f"Error: Unknown symbol on stack: {top_of_stack}"
-            print(f"{stack_str:<{max_stack_width}} | {input_str_remaining:<30} | {action:<40}")
+            action = f"Error: Unknown symbol on stack: {symbol_names[top_of_stack]}"
+            print(f"{step_stack_str:<{max_stack_width}} | {step_input_str:<30} | {action:<40}")
             return False
 
-        print(f"{stack_str:<{max_stack_width}} | {input_str_remaining:<30} | {action:<40}")
+        print(f"{step_stack_str:<{max_stack_width}} | {step_input_str:<30} | {action:<40}")
 
-        if top_of_stack == END_MARKER and current_input == END_MARKER:
+        if top_of_stack == end_id and current_input == end_id:
             print("\nParsing successful!")
             return True
 
     return False
 
+def run_untraced(ctx, tokens, token_ids, start_nt, end_id):
+    arrays = build_parser_arrays(ctx)
+    if np is None:
+        encoded_tokens = token_ids
+    else:
+        encoded_tokens = np.array(token_ids, dtype=np.int32)
+
+    # Retry with a larger stack in the rare case the first guess is too small
+    depth = 2 * len(token_ids) + 2
+    while True:
+        stack = [0] * depth if np is None else np.empty(depth, dtype=np.int32)
+        status, pos, top = run_parser(*arrays, encoded_tokens, start_nt, end_id, stack)
+        if status != PARSE_STACK_FULL:
+            break
+        depth *= 2
+
+    top_name = ctx.symbol_names[top]
+    if status == PARSE_ACCEPT:
+        print("Parsing successful!")
+        return True
+    if status == PARSE_MISMATCH:
+        print(f"Error: Mismatch (Stack: {top_name}, Input: {tokens[pos]})")
+        print("\nParsing failed: Mismatch error.")
+    elif status == PARSE_NO_ENTRY:
+        print(f"Error: No table entry for M[{top_name}, {tokens[pos]}]")
+        print("\nParsing failed: Syntax error.")
+    elif status == PARSE_UNKNOWN_SYMBOL:
+        print(f"Error: Unknown symbol on stack: {top_name}")
+    return False
+
 # Main execution
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python predictive_parser.py <grammar_file> <input_string_file>")
+    args = sys.argv[1:]
+    trace = '--trace' in args
+    args = [arg for arg in args if arg != '--trace']
+    if len(args) != 2:
+        print("Usage: python predictive_parser.py <grammar_file> <input_string_file> [--trace]")
         sys.exit(1)
 
-    grammar_file = sys.argv[1]
-    input_file = sys.argv[2]
+    grammar_file = args[0]
+    input_file = args[1]
 
     try:
         with open(grammar_file, 'r') as f:
@@ -235,6 +473,11 @@ def main():
         print(f"Error: Grammar file '{grammar_file}' not found.")
         sys.exit(1)
 
+    ctx = ParserContext()
+    grammar = ctx.grammar
+    terminals = ctx.terminals
+    non_terminals = ctx.non_terminals
+
     start_symbol = None
     for line in lines:
         line = line.strip()
@@ -246,7 +489,8 @@ def main():
             continue
 
         head, body = line.split(PRODUCTION_ARROW, 1)
-        head = head.strip()
+        # Interned symbols make every later dict/set probe an identity hit
+        head = sys.intern(head.strip())
         non_terminals.add(head)
 
         if start_symbol is None:
@@ -256,23 +500,24 @@ def main():
 
         productions = [p.strip() for p in body.split(PRODUCTION_SEPARATOR)]
         for prod in productions:
-            symbols = prod.split() if prod != '' else []
+            symbols = [sys.intern(symbol) for symbol in prod.split()]
             if not symbols:
                 symbols = [EPSILON]
-            grammar[head].append(symbols)
+            grammar[head].append(intern_production(ctx, symbols))
             for symbol in symbols:
                 if symbol != EPSILON and not ('A' <= symbol[0] <= 'Z'):
                     terminals.add(symbol)
 
     # Add any symbol that looks like non-terminal but wasn't seen as head
     all_symbols = set(terminals) | non_terminals | {EPSILON}
-    for nt in list(grammar):
-        for prod in grammar[nt]:
-            for symbol in prod:
-                # Basic check: if it starts with a capital, it's a non-terminal
-                if ('A' <= symbol[0] <= 'Z') and symbol not in all_symbols:
-                    non_terminals.add(symbol)
-                    all_symbols.add(symbol)
+    for prod in ctx.production_bodies:
+        for symbol in prod:
+            # Basic check: if it starts with a capital, it's a non-terminal
+            if ('A' <= symbol[0] <= 'Z') and symbol not in all_symbols:
+                non_terminals.add(symbol)
+                all_symbols.add(symbol)
+
+    classify_symbols(ctx)
 
     print("--- Grammar Details ---")
     print(f"Non-Terminals: {sorted(list(non_terminals))}")
@@ -280,15 +525,16 @@ def main():
     print(f"Start Symbol:  {start_symbol}\n")
 
     for nt in non_terminals:
-        compute_first(nt)
+        compute_first(ctx, nt)
 
-    compute_all_follow_sets(start_symbol)
+    compute_all_follow_sets(ctx, start_symbol)
 
-    if not construct_parsing_table(start_symbol):
+    if not construct_parsing_table(ctx, start_symbol):
         print("\nGrammar is not LL(1). Halting.")
         sys.exit(1)
 
-    print_parsing_table()
+    print_parsing_table(ctx)
+    encode_parsing_table(ctx)
 
     try:
         with open(input_file, 'r') as f:
@@ -297,7 +543,7 @@ def main():
         print(f"\nError: Input file '{input_file}' not found.")
         sys.exit(1)
 
-    parse_input_string(input_str, start_symbol)
+    parse_input_string(ctx, input_str, start_symbol, trace=trace)
 
 
 if __name__ == '__main__':